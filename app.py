@@ -1,14 +1,23 @@
-from flask import Flask, request, send_from_directory, render_template, redirect, url_for, session, Response, jsonify
+from flask import Flask, Request, request, send_from_directory, render_template, redirect, url_for, session, Response, jsonify
+from flask.json.provider import DefaultJSONProvider
+from jinja2 import FileSystemBytecodeCache, FileSystemLoader
+import orjson
 
 import os
+import sys
+import importlib.util
 import qrcode
 import io
-import base64
+import binascii
+import gzip
 import zipfile
 import shutil
+import tempfile
 import uuid
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import FileWrapper
+from werkzeug.serving import WSGIRequestHandler
 import mimetypes
 import hashlib
 import threading
@@ -17,7 +26,7 @@ from concurrent.futures import ThreadPoolExecutor
 import logging
 from datetime import datetime
 import json
-from functools import wraps
+from functools import wraps, lru_cache
 import signal
 import atexit
 
@@ -33,16 +42,80 @@ PORT = int(os.getenv("PORT", 8000))
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
 
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that uses orjson for jsonify() and request.json"""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response - no str decode/re-encode per jsonify()
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=self.default), mimetype=self.mimetype)
+
+class ChunkUploadRequest(Request):
+    """Request that keeps uploaded form files (folder chunks) in memory instead of spooling them to a temp file"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= MAX_IN_MEMORY_UPLOAD:
+            return io.BytesIO()
+        # Too big for memory - go straight to a temp file (Werkzeug would spool 500KB in memory first)
+        return tempfile.TemporaryFile('rb+')
+
+class MinifyingLoader(FileSystemLoader):
+    """Template loader that drops indentation and blank lines from each template.
+    
+    Only leading whitespace is removed, so inline JS/CSS behaves the same
+    (no template uses <pre>/<textarea> or whitespace-sensitive text)."""
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        lines = (line.strip() for line in source.splitlines())
+        return "\n".join(line for line in lines if line), filename, uptodate
+
+class NoDelayRequestHandler(WSGIRequestHandler):
+    """Built-in server handler with Nagle's algorithm off, like gunicorn's sockets.
+    
+    Small replies (chunk acks, JSON, SSE events) go out immediately instead of
+    waiting on the client's delayed ACK. Buffer sizes are left to the kernel's
+    autotuning - a fixed SO_SNDBUF/SO_RCVBUF would switch that off."""
+    disable_nagle_algorithm = True
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+app.request_class = ChunkUploadRequest
 app.secret_key = os.urandom(24) # Random key on every start to invalidate sessions
 
 # Performance Configuration
 CHUNK_SIZE = 2 * 1024 * 1024  # 2MB chunks for download
 # No global content length limit - uploads are chunked (each chunk ~5MB)
 app.config['MAX_CONTENT_LENGTH'] = None
+# With USE_GUNICORN=true, "python app.py" hands over to gunicorn when it is installed (not on Windows)
+USE_GUNICORN = os.getenv("USE_GUNICORN", "").lower() in ("1", "true", "yes")
+# Behind Apache (mod_xsendfile)/lighttpd, let the proxy send downloaded files itself
+app.config['USE_X_SENDFILE'] = os.getenv("USE_X_SENDFILE", "").lower() in ("1", "true", "yes")
 
 NUM_PARALLEL_STREAMS = 4
 STREAM_CHUNK_SIZE = 1 * 1024 * 1024  # 1MB chunks for upload (better for large files)
+FOLDER_CHUNK_SIZE = 5 * 1024 * 1024  # chunk size folder uploads send when a request doesn't say
+# Upload requests up to this size are parsed in memory (Werkzeug spools anything over 500KB to disk)
+MAX_IN_MEMORY_UPLOAD = 16 * 1024 * 1024
+COPY_BUFFER_SIZE = 64 * 1024  # per-thread buffer for disk-to-disk copies
+copy_buffers = threading.local()
+
+# Response compression - pages are large, mostly CSS/JS text
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'application/javascript', 'text/javascript', 'application/json', 'image/svg+xml'}
+COMPRESS_MIN_SIZE = 1024  # bytes - smaller bodies aren't worth the gzip header overhead
+COMPRESS_LEVEL = 6
+# Already-compressed formats are stored as-is in folder ZIPs - deflating them again only burns CPU
+ZIP_STORED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac',
+    '.mp4', '.m4v', '.mkv', '.mov', '.avi', '.webm',
+    '.docx', '.xlsx', '.pptx', '.odt', '.apk', '.jar', '.epub',
+}
+STATIC_MAX_AGE = 365 * 24 * 3600  # seconds - static URLs carry a content hash, so cache for a year
 
 # Upload Folder
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "shared_files")
@@ -51,18 +124,38 @@ METADATA_FOLDER = os.path.join(UPLOAD_FOLDER, ".metadata")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 os.makedirs(METADATA_FOLDER, exist_ok=True)
+# Folder uploads are zipped into UPLOAD_FOLDER and then deleted, so stage them in RAM
+# (tmpfs) when there's room. Single-file uploads stay in TEMP_FOLDER - they are renamed
+# into place, which only works on the same filesystem. Set to empty to stage on disk.
+FOLDER_STAGING_FOLDER = os.getenv("FOLDER_STAGING_FOLDER", "/dev/shm/file_transfer" if os.path.isdir("/dev/shm") else "")
+# Sessions don't survive a restart - clear what a crashed run left in RAM
+if FOLDER_STAGING_FOLDER and os.path.isdir(FOLDER_STAGING_FOLDER):
+    for entry in os.listdir(FOLDER_STAGING_FOLDER):
+        if entry.startswith("folder_"):
+            shutil.rmtree(os.path.join(FOLDER_STAGING_FOLDER, entry), ignore_errors=True)
 
 # Thread pool and tracking
-executor = ThreadPoolExecutor(max_workers=NUM_PARALLEL_STREAMS * 4)
+# Folder ZIPs are built here - more than two at once just fight over the disk, the rest wait their turn
+zip_executor = ThreadPoolExecutor(max_workers=2)
 active_transfers = {}
-transfer_lock = threading.Lock()
+transfer_lock = threading.Lock()  # guards the active_transfers dict; each transfer has its own 'lock'
+finished_transfers = {}  # transfer_id -> finish time, so a late chunk retry isn't written again (guarded by transfer_lock)
+TRANSFER_TIMEOUT = 600  # seconds - drop uploads that haven't sent a chunk in this long
+TRANSFER_CLEANUP_INTERVAL = 60  # seconds between sweeps for abandoned uploads
+
+# Shared folder listing, reused while the folder's mtime is unchanged
+file_list_cache = (None, [])
+# mtimes are coarse (2s on FAT) - both caches only trust a stamp this old
+FILE_LIST_MTIME_SLACK_NS = 2 * 10**9
+# Parsed metadata per file, keyed on the .json file's (mtime_ns, size)
+file_metadata_cache = {}
 
 # Track files being assembled (prevent download during assembly)
 assembling_files = set()
 assembling_lock = threading.Lock()
 
 # Track folder uploads in progress
-folder_uploads = {}  # {folder_id: {'folder_name': str, 'files': [], 'total_size': 0, 'start_time': float}}
+folder_uploads = {}  # {folder_id: {'folder_name': str, 'files': [], 'total_size': 0, 'start_time': float, 'last_activity': float}}
 folder_uploads_lock = threading.Lock()
 
 # Track folder finalization (async ZIP creation)
@@ -72,7 +165,16 @@ folder_finalize_lock = threading.Lock()
 # Chat Configuration
 chat_messages = []
 chat_lock = threading.Lock()
+chat_updated = threading.Condition(chat_lock)  # Notified whenever a message is added
+chat_message_count = 0  # Total messages ever added (chat_messages only keeps the last MAX_MESSAGES)
 MAX_MESSAGES = 100
+CHAT_KEEPALIVE = 15  # seconds between SSE keep-alive comments on an idle chat stream
+
+# Pre-encoded SSE framing so streams don't format/encode strings on every tick
+SSE_PREFIX = b"data: "
+SSE_SUFFIX = b"\n\n"
+SSE_EMPTY = b"data: []\n\n"
+SSE_KEEPALIVE = b": keep-alive\n\n"
 connected_users = {}  # {session_id: {'username': str, 'last_seen': timestamp, 'is_server': bool}}
 kicked_users = set()
 kicked_lock = threading.Lock()
@@ -91,12 +193,33 @@ metadata_lock = threading.Lock()
 client_history = []  # List of {name, ip, action, timestamp}
 history_lock = threading.Lock()
 
+# Strip indentation/blank lines from templates as they load - smaller pages and compiled templates
+app.jinja_loader = MinifyingLoader(os.path.join(app.root_path, app.template_folder))
+
+# Cache compiled template bytecode on disk so restarts skip Jinja's code generation
+# (defaults to a per-user directory in the system temp folder)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+# Templates don't change while the server runs - skip the mtime check on every render
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+
+# Page templates - compiled once at startup and rendered directly, skipping the
+# per-request loader lookup (render_template accepts Template objects)
+LOGIN_TEMPLATE = app.jinja_env.get_template("login.html")
+DASHBOARD_TEMPLATE = app.jinja_env.get_template("dashboard.html")
+FILES_TEMPLATE = app.jinja_env.get_template("files.html")
+JOIN_TEMPLATE = app.jinja_env.get_template("join.html")
+FILE_ARRANGED_TEMPLATE = app.jinja_env.get_template("file_arranged.html")
+CHAT_APP_TEMPLATE = app.jinja_env.get_template("chat_app.html")
+
 
 def set_user_role(role):
     session['role'] = role
 
 # Helper Functions
 def create_qr_data_uri(data):
+    """Render a QR code as a PNG data URI"""
     qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=10, border=4)
     qr.add_data(data)
     qr.make(fit=True)
@@ -104,13 +227,123 @@ def create_qr_data_uri(data):
     
     buf = io.BytesIO()
     img.save(buf, format="PNG")
-    byte_data = buf.getvalue()
     
-    base64_data = base64.b64encode(byte_data).decode('utf-8')
-    return f"data:image/png;base64,{base64_data}"
+    return "data:image/png;base64," + binascii.b2a_base64(buf.getbuffer(), newline=False).decode('ascii')
+
+# The Wi-Fi details and join URL never change while running - encode their QR codes once
+WIFI_STRING = f"WIFI:T:WPA;S:{HOTSPOT_SSID};P:{HOTSPOT_PASSWORD};;"
+JOIN_URL = f"http://{HOTSPOT_IP}:{PORT}/join"
+WIFI_QR_URI = create_qr_data_uri(WIFI_STRING)
+JOIN_QR_URI = create_qr_data_uri(JOIN_URL)
+
+def preallocate_file(fd, size):
+    """Reserve disk space for a file before writing it"""
+    if size <= 0:
+        return
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except AttributeError:
+        # No posix_fallocate on Windows/macOS - extending the file is the closest match
+        os.ftruncate(fd, size)
+    except OSError:
+        # Filesystem doesn't support preallocation - writes will extend the file
+        pass
+
+def open_part_file(path, size):
+    """Open an upload's partial file for writing, creating and preallocating it on first use"""
+    flags = os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    try:
+        fd = os.open(path, flags | os.O_CREAT | os.O_EXCL)
+    except FileExistsError:
+        return os.open(path, flags)
+    preallocate_file(fd, size)
+    return fd
+
+def write_at(fd, data, offset):
+    """Write all of data at offset without touching any shared file position"""
+    view = memoryview(data)
+    while view:
+        if hasattr(os, 'pwrite'):
+            written = os.pwrite(fd, view, offset)
+        else:
+            # No pwrite on Windows - every request opens its own fd, so seeking is safe
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = os.write(fd, view)
+        view = view[written:]
+        offset += written
+
+def valid_chunk_position(chunk_index, total_chunks, chunk_unit, total_size):
+    """Check client-supplied chunk fields: the index is in range and the chunk count fits the file size"""
+    return (chunk_unit > 0 and 0 <= chunk_index < total_chunks
+            and (total_chunks - 1) * chunk_unit <= total_size <= total_chunks * chunk_unit)
+
+def valid_chunk_length(length, chunk_count, chunk_unit, reaches_end):
+    """Check a request delivered all chunk_count chunks - only the file's last chunk may be short"""
+    if reaches_end:
+        return (chunk_count - 1) * chunk_unit <= length <= chunk_count * chunk_unit
+    return length == chunk_count * chunk_unit
+
+def write_stream_at(fd, stream, offset):
+    """Write an uploaded chunk's stream at offset and return the number of bytes written"""
+    if isinstance(stream, io.BytesIO):
+        # Parsed in memory - write straight from the request buffer, no copy
+        with stream.getbuffer() as data:
+            write_at(fd, data, offset)
+            return len(data)
+    
+    written = 0
+    buf = get_copy_buffer()
+    view = memoryview(buf)
+    while True:
+        n = stream.readinto(buf)
+        if not n:
+            break
+        write_at(fd, view[:n], offset + written)
+        written += n
+    return written
+
+def folder_staging_path(total_size):
+    """Directory to stage a folder upload in - tmpfs while it has room for twice the folder, else TEMP_FOLDER.
+    
+    Call with folder_uploads_lock held, so concurrent uploads can't each claim the same free space."""
+    if FOLDER_STAGING_FOLDER:
+        try:
+            os.makedirs(FOLDER_STAGING_FOLDER, exist_ok=True)
+            # Folders already staged there will grow to their advertised size - count that space as taken
+            reserved = sum(info['total_size'] for info in folder_uploads.values()
+                           if os.path.dirname(info['temp_path']) == FOLDER_STAGING_FOLDER)
+            if shutil.disk_usage(FOLDER_STAGING_FOLDER).free - reserved >= 2 * total_size:
+                return FOLDER_STAGING_FOLDER
+        except OSError:
+            pass
+    return TEMP_FOLDER
+
+def get_copy_buffer():
+    """This thread's reusable buffer for streaming file copies - no new bytes object per read"""
+    buf = getattr(copy_buffers, 'buf', None)
+    if buf is None:
+        buf = copy_buffers.buf = bytearray(COPY_BUFFER_SIZE)
+    return buf
+
+@lru_cache(maxsize=4)
+def large_block_file_wrapper(wrapper_class):
+    """Subclass of the server's wsgi.file_wrapper that reads CHUNK_SIZE blocks.
+    
+    Still an instance of the server's own class, so servers that check for it
+    (gunicorn) keep their sendfile() path when it is enabled."""
+    class LargeBlockFileWrapper(wrapper_class):
+        def __init__(self, filelike, blksize=CHUNK_SIZE):
+            super().__init__(filelike, CHUNK_SIZE)
+    return LargeBlockFileWrapper
 
 def get_file_hash(filename):
-    return hashlib.md5(filename.encode()).hexdigest()
+    """Short, non-cryptographic transfer ID for a filename"""
+    return hashlib.blake2b(filename.encode(), digest_size=8).hexdigest()
+
+@lru_cache(maxsize=512)
+def get_mimetype(ext):
+    """Get the mimetype for a file extension - cached since downloads repeat the same few types"""
+    return mimetypes.guess_type(f"file{ext}")[0] or 'application/octet-stream'
 
 def get_username():
     """Get username from session - returns None if not set"""
@@ -121,8 +354,9 @@ def is_username_set():
     return 'username' in session and session['username'] is not None
 
 def add_chat_message(username, message, message_type='text'):
-    """Add a message to the chat"""
-    with chat_lock:
+    """Add a message to the chat and wake up any listening SSE streams"""
+    global chat_message_count
+    with chat_updated:
         chat_messages.append({
             'username': username,
             'message': message,
@@ -132,6 +366,8 @@ def add_chat_message(username, message, message_type='text'):
         # Keep only last MAX_MESSAGES
         if len(chat_messages) > MAX_MESSAGES:
             chat_messages.pop(0)
+        chat_message_count += 1
+        chat_updated.notify_all()
 
 def get_metadata_path(filename):
     """Get path to metadata file for a given filename"""
@@ -147,12 +383,25 @@ def save_file_metadata(filename, metadata):
         print(f"Error saving metadata for {filename}: {e}")
 
 def load_file_metadata(filename):
-    """Load metadata for a file"""
+    """Load metadata for a file (cached until the .json changes - don't modify the result)"""
+    metadata_path = get_metadata_path(filename)
     try:
-        metadata_path = get_metadata_path(filename)
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                return json.load(f)
+        st = os.stat(metadata_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = file_metadata_cache.get(filename)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+        # Same slack as list_shared_files - a rewrite within the mtime
+        # granularity (e.g. two quick downloads) could keep the same stamp
+        if time.time_ns() - st.st_mtime_ns > FILE_LIST_MTIME_SLACK_NS:
+            file_metadata_cache[filename] = (stamp, metadata)
+        else:
+            file_metadata_cache.pop(filename, None)
+        return metadata
+    except FileNotFoundError:
+        file_metadata_cache.pop(filename, None)
     except Exception as e:
         print(f"Error loading metadata for {filename}: {e}")
     
@@ -165,19 +414,34 @@ def load_file_metadata(filename):
         'downloads': []
     }
 
+def list_shared_files():
+    """Names of the shared files (hidden entries skipped), cached until the folder's mtime changes.
+    
+    Callers must not modify the returned list."""
+    global file_list_cache
+    mtime = os.stat(UPLOAD_FOLDER).st_mtime_ns
+    cached_mtime, cached_list = file_list_cache
+    if mtime == cached_mtime:
+        return cached_list
+    
+    file_list = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith('.')]
+    # Directory mtimes are coarse (2s on FAT) - only trust a listing once the
+    # folder has been quiet long enough that another change would move the mtime
+    if time.time_ns() - mtime > FILE_LIST_MTIME_SLACK_NS:
+        file_list_cache = (mtime, file_list)
+    return file_list
+
 def add_download_record(filename, username):
     """Add a download record to file metadata"""
-    metadata = load_file_metadata(filename)
+    # Copy - the loaded dict is shared with the metadata cache
+    metadata = dict(load_file_metadata(filename))
     
     download_record = {
         'username': username,
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     }
     
-    if 'downloads' not in metadata:
-        metadata['downloads'] = []
-    
-    metadata['downloads'].append(download_record)
+    metadata['downloads'] = metadata.get('downloads', []) + [download_record]
     save_file_metadata(filename, metadata)
 
 def update_user_activity():
@@ -189,20 +453,13 @@ def update_user_activity():
             # This helps distinguish multiple users from same IP
             session_id = f"{request.remote_addr}_{username}_{session.get('_id', 'default')}"
             is_server = session.get('role') == 'server'
+            # Stale users are pruned by get_online_users(), so this stays O(1) per request
             with user_lock:
                 connected_users[session_id] = {
                     'username': username,
                     'last_seen': time.time(),
                     'is_server': is_server
                 }
-                # Clean up old users
-                current_time = time.time()
-                to_remove = []
-                for sid, user_data in connected_users.items():
-                    if current_time - user_data['last_seen'] > USER_TIMEOUT:
-                        to_remove.append(sid)
-                for sid in to_remove:
-                    del connected_users[sid]
 
 def get_online_users():
     """Get list of currently online users"""
@@ -240,7 +497,7 @@ def save_all_metadata_to_file():
             f.write("=" * 80 + "\n\n")
             
             # Get all files
-            file_list = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith('.')]
+            file_list = list_shared_files()
             
             if not file_list:
                 f.write("No files were uploaded during this session.\n\n")
@@ -300,6 +557,62 @@ def save_all_metadata_to_file():
         traceback.print_exc()
         return None
 
+def cleanup_stale_transfers():
+    """Background loop: forget abandoned chunked and folder uploads and delete their partial files"""
+    while True:
+        time.sleep(TRANSFER_CLEANUP_INTERVAL)
+        current_time = time.time()
+        with transfer_lock:
+            stale = [(tid, info) for tid, info in active_transfers.items()
+                     if current_time - info['last_activity'] > TRANSFER_TIMEOUT]
+            for tid, info in stale:
+                del active_transfers[tid]
+            # Retries don't outlive the client's backoff - forget finished uploads after a while
+            for tid in [tid for tid, finished in finished_transfers.items()
+                        if current_time - finished > TRANSFER_TIMEOUT]:
+                del finished_transfers[tid]
+        
+        for tid, info in stale:
+            print(f"Dropping abandoned upload: {info['filename']} ({info['received']}/{info['total_chunks']} chunks)")
+            try:
+                os.remove(os.path.join(TEMP_FOLDER, f"{tid}.part"))
+            except OSError:
+                pass
+        
+        # .part files no upload owns any more (e.g. left by a crash) - only old ones, so a new upload is never hit
+        with transfer_lock:
+            owned = {f"{tid}.part" for tid in active_transfers}
+        try:
+            for entry in os.scandir(TEMP_FOLDER):
+                if (entry.name.endswith('.part') and entry.name not in owned and entry.is_file()
+                        and current_time - entry.stat().st_mtime > TRANSFER_TIMEOUT):
+                    print(f"Removing orphaned partial file: {entry.name}")
+                    os.remove(entry.path)
+        except OSError:
+            pass
+        
+        # Abandoned folder uploads hold their staged files (often in RAM) and their tmpfs reservation
+        with folder_uploads_lock:
+            stale_folders = [(fid, info) for fid, info in folder_uploads.items()
+                             if not info.get('finalizing')
+                             and current_time - info['last_activity'] > TRANSFER_TIMEOUT]
+            for fid, info in stale_folders:
+                del folder_uploads[fid]
+        
+        for fid, info in stale_folders:
+            print(f"Dropping abandoned folder upload: {info['folder_name']} ({info['received_files']}/{info['total_files']} files)")
+            shutil.rmtree(info['temp_path'], ignore_errors=True)
+
+@lru_cache(maxsize=8)
+def render_login_page(error=None):
+    """Render the login page - it only depends on the (fixed set of) error messages, so cache each variant"""
+    return render_template(LOGIN_TEMPLATE, error=error)
+
+@lru_cache(maxsize=1)
+def get_login_page_gzip():
+    """Gzipped login page without an error - built once, served as-is on every GET"""
+    return gzip.compress(render_login_page(None).encode('utf-8'), compresslevel=9)
+
 # Authentication decorator
 def login_required(f):
     @wraps(f)
@@ -320,11 +633,93 @@ def check_if_kicked():
             session.clear()
             return redirect(url_for("join_page"))
 
+@lru_cache(maxsize=64)
+def get_static_version(filename):
+    """Short content hash of a static file, used to bust the browser cache when it changes"""
+    with open(os.path.join(app.static_folder, filename), 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=4).hexdigest()
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """Add ?v=<content hash> to static URLs so browsers can cache them for good"""
+    if endpoint == 'static' and 'filename' in values:
+        values.setdefault('v', get_static_version(values['filename']))
+
+@app.after_request
+def cache_static_files(response):
+    """Versioned static files never change under the same URL"""
+    if request.endpoint == 'static' and 'v' in request.args and response.status_code in (200, 304):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+@lru_cache(maxsize=64)
+def gzip_static_file(filename, etag):
+    """Gzipped body of a static file, or None when it's too small to bother - keyed on its ETag so an edited file is compressed again"""
+    with open(os.path.join(app.static_folder, filename), 'rb') as f:
+        data = f.read()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return None
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+@app.after_request
+def compress_response(response):
+    """Gzip pages and other text responses for clients that accept it"""
+    # Static files are small; other passthrough/streamed bodies are downloads and SSE streams
+    is_static = request.endpoint == 'static'
+    if (response.status_code != 200
+            or (not is_static and (response.direct_passthrough or response.is_streamed))
+            or response.mimetype not in COMPRESS_MIMETYPES
+            or 'Content-Encoding' in response.headers
+            or request.accept_encodings.quality('gzip') <= 0):
+        return response
+    # With X-Sendfile the proxy sends the file itself - a gzip header would mislabel it
+    if 'X-Sendfile' in response.headers or app.config['USE_X_SENDFILE']:
+        return response
+    
+    etag, weak = response.get_etag()
+    if is_static and etag:
+        # Static files don't change under the same ETag - compress each one once
+        body = gzip_static_file(request.view_args['filename'], etag)
+        if body is None:
+            return response
+        # Drop the file send_file opened - the body comes from the cache
+        response.close()
+        response.direct_passthrough = False
+        if request.if_none_match.contains(etag + '-gzip'):
+            # Revalidating the gzip copy - send_file only compared the identity ETag
+            response.status_code = 304
+            response.set_data(b'')
+            response.set_etag(etag + '-gzip', weak)
+            response.vary.add('Accept-Encoding')
+            return response
+        response.set_data(body)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    if etag:
+        # The gzip body is a different representation - don't let caches match it to the identity one
+        response.set_etag(etag + '-gzip', weak)
+    return response
+
 # Routes
 @app.route("/", methods=["GET", "POST"])
 def login():
     # ALWAYS show login page first - no auto-redirect
     # This ensures login page appears every time, whether old or new user
+    if request.method == "GET" and request.accept_encodings.quality('gzip') > 0:
+        # Plain GET - serve the pre-rendered, pre-compressed page
+        response = Response(get_login_page_gzip(), mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+        return response
+    
     error = None
     if request.method == "POST":
         if request.form["username"] == ADMIN_USERNAME and request.form["password"] == ADMIN_PASSWORD:
@@ -379,7 +774,7 @@ def login():
         else:
             error = "Invalid username or password"
     
-    return render_template("login.html", error=error)
+    return render_login_page(error)
 
 # ============ CLIENT JOIN PERMISSION SYSTEM ============
 
@@ -389,7 +784,7 @@ def join_page():
     # If already approved, redirect to files
     if session.get('join_approved') and session.get('logged_in'):
         return redirect(url_for('files'))
-    return render_template("join.html")
+    return render_template(JOIN_TEMPLATE)
 
 @app.route("/join/request", methods=["POST"])
 def join_request():
@@ -577,13 +972,7 @@ def dashboard():
     # Track user activity
     update_user_activity()
     
-    wifi_string = f"WIFI:T:WPA;S:{HOTSPOT_SSID};P:{HOTSPOT_PASSWORD};;"
-    wifi_qr_uri = create_qr_data_uri(wifi_string)
-
-    url_string = f"http://{HOTSPOT_IP}:{PORT}/join"
-    url_qr_uri = create_qr_data_uri(url_string)
-    
-    file_list = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith('.')]
+    file_list = list_shared_files()
 
     # Get username
     username = get_username()
@@ -599,10 +988,10 @@ def dashboard():
         files_metadata[filename] = load_file_metadata(filename)
 
     return render_template(
-        "dashboard.html",
-        wifi_qr=wifi_qr_uri,
-        url_qr=url_qr_uri,
-        url_string_for_copy=url_string,
+        DASHBOARD_TEMPLATE,
+        wifi_qr=WIFI_QR_URI,
+        url_qr=JOIN_QR_URI,
+        url_string_for_copy=JOIN_URL,
         files=file_list,
         username=username or '',
         username_set=username_set,
@@ -658,7 +1047,7 @@ def files():
     if not is_localhost and not session.get('join_approved'):
         return redirect(url_for('join_page'))
     
-    file_list = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith('.')]
+    file_list = list_shared_files()
     username_set = is_username_set()
     
     # Check which files are being assembled
@@ -673,7 +1062,7 @@ def files():
     # Keep the access token in session so refresh works
     # Don't remove it - this allows users to refresh without being redirected to login
     
-    return render_template("files.html", files=file_list, username=username or '', username_set=username_set, assembling_files=assembling_list, files_metadata=files_metadata,)
+    return render_template(FILES_TEMPLATE, files=file_list, username=username or '', username_set=username_set, assembling_files=assembling_list, files_metadata=files_metadata,)
 
 def get_file_icon(filename):
     """Generate SVG icon based on file type"""
@@ -744,7 +1133,7 @@ def file_arranged():
     """Grid view file browser like Windows Explorer"""
     update_user_activity()
     
-    file_list = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith('.')]
+    file_list = list_shared_files()
     
     # Load metadata for all files
     files_metadata = {}
@@ -754,7 +1143,7 @@ def file_arranged():
     is_controller = session.get('role') == 'server'
     
     return render_template(
-        "file_arranged.html", 
+        FILE_ARRANGED_TEMPLATE,
         files=file_list,
         files_metadata=files_metadata,
         get_file_icon=get_file_icon,
@@ -765,7 +1154,7 @@ def file_arranged():
 @login_required
 def api_files():
     """JSON API: return current file list with metadata and icons for live refresh"""
-    file_list = [f for f in os.listdir(UPLOAD_FOLDER) if not f.startswith('.')]
+    file_list = list_shared_files()
     
     files_data = {}
     for filename in file_list:
@@ -790,125 +1179,170 @@ def upload_chunk():
     if not is_username_set():
         return jsonify({'success': False, 'error': 'Please set your username first'}), 400
     try:
-        chunk = request.files['chunk']
-        chunk_index = int(request.form['chunkIndex'])
-        total_chunks = int(request.form['totalChunks'])
-        filename = secure_filename(request.form['filename'])
-        stream_id = request.form.get('streamId', '0')
-        
-        transfer_id = get_file_hash(filename)
-        
-        # Store chunk
-        temp_chunk_path = os.path.join(TEMP_FOLDER, f"{transfer_id}_chunk_{chunk_index}")
-        chunk.save(temp_chunk_path)
-        
-        # Verify chunk was saved
-        if not os.path.exists(temp_chunk_path):
-            print(f"ERROR: Chunk {chunk_index} not saved!")
-            return jsonify({'success': False, 'error': 'Chunk save failed'}), 500
-        
-        chunk_size = os.path.getsize(temp_chunk_path)
+        # The body is the raw chunk data and its details are in the query string,
+        # so nothing is multipart-parsed or buffered before it reaches the file
+        params = request.args
+        chunk_index = int(params['chunkIndex'])
+        total_chunks = int(params['totalChunks'])
+        filename = secure_filename(params['filename'])
+        stream_id = params.get('streamId', '0')
+        total_size = int(params.get('totalSize', 0))
+        chunk_unit = int(params.get('chunkSize', STREAM_CHUNK_SIZE))
+        if not valid_chunk_position(chunk_index, total_chunks, chunk_unit, total_size):
+            return jsonify({'success': False, 'error': 'Invalid chunk parameters'}), 400
+        # A request may carry several consecutive chunks (the client grows requests on fast links)
+        chunk_count = max(1, min(int(params.get('chunkCount', 1)), total_chunks - chunk_index))
+        chunk_offset = chunk_index * chunk_unit
+        
+        if 'transferId' in params:
+            # Random per-upload ID from the client - normalised, so it is safe in a path
+            try:
+                transfer_id = uuid.UUID(params['transferId']).hex
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Invalid transferId'}), 400
+        else:
+            transfer_id = get_file_hash(filename)
+        part_path = os.path.join(TEMP_FOLDER, f"{transfer_id}.part")
         
-        # Track progress
+        # Track progress - the global lock only guards the dict, each transfer has its own lock.
+        # The entry exists before the .part does, so the cleanup sweep always knows who owns it.
         with transfer_lock:
-            if transfer_id not in active_transfers:
-                active_transfers[transfer_id] = {
+            if transfer_id in finished_transfers:
+                # Late retry of a chunk that already landed - the file is done
+                return jsonify({'success': True, 'completed': True})
+            transfer = active_transfers.get(transfer_id)
+            if transfer is None:
+                transfer = active_transfers[transfer_id] = {
                     'filename': filename,
                     'total_chunks': total_chunks,
-                    'received_chunks': set(),
+                    'received_mask': 0,  # bit i set once chunk i has been written
+                    'received': 0,
+                    'chunk_unit': chunk_unit,
+                    'last_chunk_size': 0,
                     'start_time': time.time(),
+                    'last_activity': time.time(),  # the cleanup sweep may see the entry before its first update
                     'total_bytes': 0,
-                    'chunk_sizes': {}
+                    'writers': 0,  # requests currently writing the .part
+                    'lock': threading.Lock()
                 }
+        
+        with transfer['lock']:
+            if transfer.get('finishing'):
+                # Every chunk is in and the file is being renamed - don't recreate the .part
+                return jsonify({'success': True, 'completed': True})
+            # The file is only finished once no request is writing it any more
+            transfer['writers'] += 1
+        
+        # Write the chunk straight to its place in the partial file - parallel
+        # streams write their own offsets, so finishing is just a rename
+        chunk_size = None
+        try:
+            fd = open_part_file(part_path, total_size)
+            try:
+                chunk_size = write_stream_at(fd, request.stream, chunk_offset)
+            finally:
+                os.close(fd)
+        finally:
+            # Only mark chunks that really arrived - every one but the file's last must be a full chunk_unit
+            valid = chunk_size is not None and valid_chunk_length(
+                chunk_size, chunk_count, chunk_unit, chunk_index + chunk_count >= total_chunks)
+            with transfer['lock']:
+                transfer['writers'] -= 1
+                if valid:
+                    # Mark each chunk the request covered - a retry, even with a different span, just sets bits again
+                    span_mask = ((1 << chunk_count) - 1) << chunk_index
+                    # The first request fixed the chunk count - ignore bits past it
+                    span_mask &= (1 << transfer['total_chunks']) - 1
+                    new_bits = span_mask & ~transfer['received_mask']
+                    if new_bits:
+                        transfer['received_mask'] |= new_bits
+                        transfer['received'] += bin(new_bits).count('1')
+                    if chunk_index + chunk_count >= total_chunks:
+                        transfer['last_chunk_size'] = chunk_size - (chunk_count - 1) * chunk_unit
+                    transfer['total_bytes'] += chunk_size
+                transfer['last_activity'] = time.time()
+                received = transfer['received']
+                idle = transfer['writers'] == 0
+                completed = idle and received == transfer['total_chunks'] and not transfer.get('finishing')
+                if completed:
+                    # Only the request that completes the set finishes the file. Retire the ID
+                    # before anyone else can take this lock, so a late retry can't start writing.
+                    transfer['finishing'] = True
+                    with transfer_lock:
+                        active_transfers.pop(transfer_id, None)
+                        if 'transferId' in params:
+                            # Filename-hash IDs are reused by the next upload of the same name - only remember random ones
+                            finished_transfers[transfer_id] = time.time()
+                elif idle and not transfer['received_mask']:
+                    # Nothing has landed and nobody else has the file open - don't leave a
+                    # preallocated .part behind (the next writer creates it again)
+                    try:
+                        os.remove(part_path)
+                    except OSError:
+                        pass
+        
+        if not valid:
+            return jsonify({'success': False, 'error': 'Incomplete chunk'}), 400
+        
+        if completed:
+            # Mark file as being assembled
+            with assembling_lock:
+                assembling_files.add(filename)
             
-            active_transfers[transfer_id]['received_chunks'].add(chunk_index)
-            active_transfers[transfer_id]['chunk_sizes'][chunk_index] = chunk_size
-            active_transfers[transfer_id]['total_bytes'] += chunk_size
-            received = len(active_transfers[transfer_id]['received_chunks'])
+            final_path = os.path.join(UPLOAD_FOLDER, filename)
             
-            # Check if complete
-            if received == total_chunks:
-                print(f"All chunks received! Assembling file: {filename}")
+            # Finish file - every chunk is already in place
+            try:
+                # Every chunk but the last is a full chunk_unit
+                expected_size = (total_chunks - 1) * transfer['chunk_unit'] + transfer['last_chunk_size']
+                
+                # Drop any preallocated space that wasn't written - the file is now exactly expected_size
+                os.truncate(part_path, expected_size)
+                os.replace(part_path, final_path)
+                final_size = expected_size
+                
+                if total_size and final_size != total_size:
+                    print(f"WARNING: Size mismatch! Got {final_size}, expected {total_size}")
+                
+                elapsed = time.time() - transfer['start_time']
+                speed_mbps = (final_size / elapsed) / (1024 * 1024) if elapsed > 0 else 0
                 
-                # Mark file as being assembled
+                print(f"✓✓✓ Upload complete: {filename} ({final_size / (1024*1024):.2f} MB in {elapsed:.2f}s = {speed_mbps:.2f} MB/s)")
+                
+                # Save file metadata
+                username = get_username()
+                metadata = {
+                    'filename': filename,
+                    'uploaded_by': username,
+                    'upload_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'file_size': final_size,
+                    'downloads': []
+                }
+                save_file_metadata(filename, metadata)
+                
+                # Mark file as ready for download
                 with assembling_lock:
-                    assembling_files.add(filename)
+                    if filename in assembling_files:
+                        assembling_files.remove(filename)
                 
-                final_path = os.path.join(UPLOAD_FOLDER, filename)
+                # Add system message to chat
+                add_chat_message('System', f'{username} uploaded {filename} ({final_size / (1024*1024):.2f} MB)', 'system')
                 
-                # Assemble file
-                try:
-                    with open(final_path, 'wb') as outfile:
-                        for i in range(total_chunks):
-                            chunk_path = os.path.join(TEMP_FOLDER, f"{transfer_id}_chunk_{i}")
-                            
-                            if not os.path.exists(chunk_path):
-                                print(f"ERROR: Missing chunk {i}!")
-                                raise Exception(f"Missing chunk {i}")
-                            
-                            with open(chunk_path, 'rb') as infile:
-                                chunk_data = infile.read()
-                                outfile.write(chunk_data)
-                            
-                            os.remove(chunk_path)
-                    
-                    # Verify file size
-                    final_size = os.path.getsize(final_path)
-                    expected_size = sum(active_transfers[transfer_id]['chunk_sizes'].values())
-                    
-                    if final_size != expected_size:
-                        print(f"WARNING: Size mismatch! Got {final_size}, expected {expected_size}")
-                    
-                    elapsed = time.time() - active_transfers[transfer_id]['start_time']
-                    speed_mbps = (final_size / elapsed) / (1024 * 1024)
-                    
-                    print(f"✓✓✓ Upload complete: {filename} ({final_size / (1024*1024):.2f} MB in {elapsed:.2f}s = {speed_mbps:.2f} MB/s)")
-                    
-                    # Save file metadata
-                    username = get_username()
-                    metadata = {
-                        'filename': filename,
-                        'uploaded_by': username,
-                        'upload_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'file_size': final_size,
-                        'downloads': []
-                    }
-                    save_file_metadata(filename, metadata)
-                    
-                    # Mark file as ready for download
-                    with assembling_lock:
-                        if filename in assembling_files:
-                            assembling_files.remove(filename)
-                    
-                    # Add system message to chat
-                    add_chat_message('System', f'{username} uploaded {filename} ({final_size / (1024*1024):.2f} MB)', 'system')
-                    
-                    del active_transfers[transfer_id]
-                    
-                    return jsonify({'success': True, 'completed': True, 'speed': speed_mbps, 'size': final_size})
+                return jsonify({'success': True, 'completed': True, 'speed': speed_mbps, 'size': final_size})
+            
+            except Exception as e:
+                print(f"ERROR assembling file: {e}")
                 
-                except Exception as e:
-                    print(f"ERROR assembling file: {e}")
-                    
-                    # Remove from assembling list
-                    with assembling_lock:
-                        if filename in assembling_files:
-                            assembling_files.remove(filename)
-                    
-                    # Clean up chunks on error
-                    for i in range(total_chunks):
-                        chunk_path = os.path.join(TEMP_FOLDER, f"{transfer_id}_chunk_{i}")
-                        if os.path.exists(chunk_path):
-                            os.remove(chunk_path)
-                    
-                    # Remove incomplete file
-                    if os.path.exists(final_path):
-                        os.remove(final_path)
-                    
-                    if transfer_id in active_transfers:
-                        del active_transfers[transfer_id]
-                    
-                    return jsonify({'success': False, 'error': str(e)}), 500
+                # Remove from assembling list
+                with assembling_lock:
+                    if filename in assembling_files:
+                        assembling_files.remove(filename)
+                
+                # Remove incomplete file
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                
+                return jsonify({'success': False, 'error': str(e)}), 500
         
         return jsonify({'success': True, 'completed': False, 'received': received, 'total': total_chunks})
         
@@ -975,26 +1409,29 @@ def upload_progress():
     def generate():
         while True:
             with transfer_lock:
-                if active_transfers:
-                    data = []
-                    for transfer_id, info in active_transfers.items():
-                        received = len(info['received_chunks'])
-                        total = info['total_chunks']
-                        percent = (received / total) * 100 if total > 0 else 0
-                        elapsed = time.time() - info['start_time']
-                        speed = (info['total_bytes'] / elapsed) / (1024 * 1024) if elapsed > 0 else 0
-                        
-                        data.append({
-                            'filename': info['filename'],
-                            'percent': round(percent, 1),
-                            'speed': round(speed, 2),
-                            'received': received,
-                            'total': total
-                        })
+                transfers = list(active_transfers.values())
+            
+            # Build and send the event outside the lock - a slow client must not stall uploads
+            if transfers:
+                data = []
+                for info in transfers:
+                    received = info['received']
+                    total = info['total_chunks']
+                    percent = (received / total) * 100 if total > 0 else 0
+                    elapsed = time.time() - info['start_time']
+                    speed = (info['total_bytes'] / elapsed) / (1024 * 1024) if elapsed > 0 else 0
                     
-                    yield f"data: {jsonify(data).get_data(as_text=True)}\n\n"
-                else:
-                    yield f"data: []\n\n"
+                    data.append({
+                        'filename': info['filename'],
+                        'percent': round(percent, 1),
+                        'speed': round(speed, 2),
+                        'received': received,
+                        'total': total
+                    })
+                
+                yield SSE_PREFIX + orjson.dumps(data) + SSE_SUFFIX
+            else:
+                yield SSE_EMPTY
             
             time.sleep(0.5)
     
@@ -1013,16 +1450,16 @@ def upload_folder_start():
         data = request.json
         folder_name = secure_filename(data.get('folderName', 'folder'))
         total_files = data.get('totalFiles', 0)
-        total_size = data.get('totalSize', 0)
+        total_size = max(0, int(data.get('totalSize', 0)))
         
         # Generate unique folder upload ID
         folder_id = str(uuid.uuid4())
         
-        # Create temp directory for this folder upload
-        folder_temp_path = os.path.join(TEMP_FOLDER, f"folder_{folder_id}")
-        os.makedirs(folder_temp_path, exist_ok=True)
-        
         with folder_uploads_lock:
+            # Create temp directory for this folder upload
+            folder_temp_path = os.path.join(folder_staging_path(total_size), f"folder_{folder_id}")
+            os.makedirs(folder_temp_path, exist_ok=True)
+            
             folder_uploads[folder_id] = {
                 'folder_name': folder_name,
                 'temp_path': folder_temp_path,
@@ -1030,7 +1467,9 @@ def upload_folder_start():
                 'total_size': total_size,
                 'received_files': 0,
                 'received_bytes': 0,
+                'files': {},  # relative path -> chunks received so far, for multi-chunk files
                 'start_time': time.time(),
+                'last_activity': time.time(),
                 'username': get_username()
             }
         
@@ -1060,8 +1499,12 @@ def upload_folder_file():
             return jsonify({'success': False, 'error': 'Invalid folder upload session'}), 400
         
         with folder_uploads_lock:
-            folder_info = folder_uploads[folder_id]
+            folder_info = folder_uploads.get(folder_id)
+            if folder_info is None:
+                # Dropped by the cleanup sweep since the check above
+                return jsonify({'success': False, 'error': 'Invalid folder upload session'}), 400
             folder_temp_path = folder_info['temp_path']
+            folder_info['last_activity'] = time.time()
         
         # Sanitize the relative path to prevent directory traversal
         # Keep the folder structure but make safe
@@ -1078,37 +1521,63 @@ def upload_folder_file():
         
         # Handle chunked file upload
         if total_chunks > 1:
-            # Multi-chunk file
-            chunk_path = f"{file_path}.chunk_{chunk_index}"
-            file_chunk.save(chunk_path)
+            # Multi-chunk file - each chunk is written at its offset in a preallocated
+            # .part file, so the last one to arrive only has to rename it
+            with folder_uploads_lock:
+                parts = folder_info['files'].get(safe_relative_path)
+                if parts and parts.get('finishing'):
+                    # Late retry of a chunk that already landed - the file is done
+                    return jsonify({'success': True})
             
-            # Check if all chunks received for this file
-            all_chunks_received = True
-            for i in range(total_chunks):
-                if not os.path.exists(f"{file_path}.chunk_{i}"):
-                    all_chunks_received = False
-                    break
+            chunk_unit = int(request.form.get('chunkSize', FOLDER_CHUNK_SIZE))
+            file_size = int(request.form.get('fileSize', 0))
+            if not valid_chunk_position(chunk_index, total_chunks, chunk_unit, file_size):
+                return jsonify({'success': False, 'error': 'Invalid chunk parameters'}), 400
             
-            if all_chunks_received:
-                # Assemble the file from chunks
-                with open(file_path, 'wb') as outfile:
-                    for i in range(total_chunks):
-                        chunk_file = f"{file_path}.chunk_{i}"
-                        with open(chunk_file, 'rb') as infile:
-                            outfile.write(infile.read())
-                        os.remove(chunk_file)
+            part_path = f"{file_path}.part"
+            fd = open_part_file(part_path, file_size)
+            try:
+                chunk_size = write_stream_at(fd, file_chunk.stream, chunk_index * chunk_unit)
+            finally:
+                os.close(fd)
+            if not valid_chunk_length(chunk_size, 1, chunk_unit, chunk_index == total_chunks - 1):
+                return jsonify({'success': False, 'error': 'Incomplete chunk'}), 400
+            
+            with folder_uploads_lock:
+                parts = folder_info['files'].setdefault(safe_relative_path, {
+                    'total_chunks': total_chunks,
+                    'received_mask': 0,
+                    'last_chunk_size': 0
+                })
+                if chunk_index < parts['total_chunks']:
+                    parts['received_mask'] |= 1 << chunk_index
+                if chunk_index == parts['total_chunks'] - 1:
+                    parts['last_chunk_size'] = chunk_size
+                completed = parts['received_mask'] == (1 << parts['total_chunks']) - 1 and not parts.get('finishing')
+                if completed:
+                    # Only the request that completes the set finishes the file
+                    parts['finishing'] = True
+            
+            if completed:
+                file_size = (parts['total_chunks'] - 1) * chunk_unit + parts['last_chunk_size']
+                os.truncate(part_path, file_size)
+                os.replace(part_path, file_path)
                 
                 # Update received files count
                 with folder_uploads_lock:
-                    folder_uploads[folder_id]['received_files'] += 1
-                    folder_uploads[folder_id]['received_bytes'] += os.path.getsize(file_path)
+                    folder_info['received_files'] += 1
+                    folder_info['received_bytes'] += file_size
         else:
             # Single chunk file
-            file_chunk.save(file_path)
+            fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                file_size = write_stream_at(fd, file_chunk.stream, 0)
+            finally:
+                os.close(fd)
             
             with folder_uploads_lock:
-                folder_uploads[folder_id]['received_files'] += 1
-                folder_uploads[folder_id]['received_bytes'] += os.path.getsize(file_path)
+                folder_info['received_files'] += 1
+                folder_info['received_bytes'] += file_size
         
         return jsonify({'success': True})
     
@@ -1139,6 +1608,8 @@ def upload_folder_finalize():
             folder_temp_path = folder_info['temp_path']
             username = folder_info['username']
             start_time = folder_info['start_time']
+            # The ZIP job owns the staging dir now - it may wait behind others, so the sweep must skip it
+            folder_info['finalizing'] = True
         
         zip_filename = f"{folder_name}.zip"
         zip_path = os.path.join(UPLOAD_FOLDER, zip_filename)
@@ -1176,12 +1647,15 @@ def upload_folder_finalize():
                 for root, dirs, files_in_dir in os.walk(folder_temp_path):
                     total_files_to_zip += len(files_in_dir)
                 
-                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=9) as zipf:
+                with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=COMPRESS_LEVEL) as zipf:
                     for root, dirs, files_in_dir in os.walk(folder_temp_path):
                         for file in files_in_dir:
                             file_path = os.path.join(root, file)
                             arcname = os.path.relpath(file_path, folder_temp_path)
-                            zipf.write(file_path, arcname)
+                            if os.path.splitext(file)[1].lower() in ZIP_STORED_EXTENSIONS:
+                                zipf.write(file_path, arcname, compress_type=zipfile.ZIP_STORED)
+                            else:
+                                zipf.write(file_path, arcname)
                             total_size += os.path.getsize(file_path)
                             file_count += 1
                             
@@ -1268,8 +1742,8 @@ def upload_folder_finalize():
                         'error': str(e)
                     }
         
-        # Start background ZIP creation
-        threading.Thread(target=create_zip_background, daemon=True).start()
+        # Queue background ZIP creation
+        zip_executor.submit(create_zip_background)
         
         # Return immediately - client will poll for status
         return jsonify({
@@ -1386,56 +1860,25 @@ def download_parallel(filename):
     if not os.path.exists(filepath):
         return "File not found", 404
     
-    # Record download
-    username = get_username()
-    add_download_record(filename, username)
-    
-    file_size = os.path.getsize(filepath)
-    range_header = request.headers.get('Range', None)
+    # Werkzeug handles Range/If-Range and hands the file to the server's
+    # wsgi.file_wrapper instead of a Python read loop.
+    # Flask resolves relative directories against the app root, not the cwd.
+    safe_name = secure_filename(filename)
+    mimetype = get_mimetype(os.path.splitext(safe_name)[1].lower())
+    # Werkzeug asks the wrapper for 8KB blocks - send CHUNK_SIZE blocks instead
+    # when the server iterates the file (built-in server; gunicorn uses sendfile())
+    server_wrapper = request.environ.get('wsgi.file_wrapper', FileWrapper)
+    request.environ['wsgi.file_wrapper'] = large_block_file_wrapper(server_wrapper)
+    if request.range is not None and len(request.range.ranges) > 1:
+        # Werkzeug answers multi-range requests with 416 - servers may ignore Range, so send the whole file
+        request.environ.pop('HTTP_RANGE', None)
+    response = send_from_directory(os.path.abspath(UPLOAD_FOLDER), safe_name, mimetype=mimetype, as_attachment=True, conditional=True)
     
-    if range_header:
-        byte_range = range_header.replace('bytes=', '').split('-')
-        start = int(byte_range[0]) if byte_range[0] else 0
-        end = int(byte_range[1]) if byte_range[1] else file_size - 1
-        
-        length = end - start + 1
-        
-        def generate_range():
-            with open(filepath, 'rb') as f:
-                f.seek(start)
-                remaining = length
-                while remaining > 0:
-                    chunk_size = min(CHUNK_SIZE, remaining)
-                    data = f.read(chunk_size)
-                    if not data:
-                        break
-                    remaining -= len(data)
-                    yield data
-        
-        response = Response(generate_range(), 206, mimetype=mimetypes.guess_type(filename)[0])
-        response.headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-        response.headers['Content-Length'] = str(length)
-        response.headers['Accept-Ranges'] = 'bytes'
-        response.headers['Cache-Control'] = 'no-cache'
-        
-        return response
-    else:
-        def generate():
-            with open(filepath, 'rb') as f:
-                while True:
-                    chunk = f.read(CHUNK_SIZE)
-                    if not chunk:
-                        break
-                    yield chunk
-        
-        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-        response = Response(generate(), mimetype=mimetype)
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-        response.headers['Content-Length'] = str(file_size)
-        response.headers['Accept-Ranges'] = 'bytes'
-        response.headers['Cache-Control'] = 'no-cache'
-        
-        return response
+    # Record the download once - not again for every resumed or parallel range, revalidation or bad range
+    if request.method == 'GET' and (response.status_code == 200 or
+                                    (response.status_code == 206 and response.content_range.start == 0)):
+        add_download_record(filename, get_username())
+    return response
 
 @app.route("/file_info/<filename>")
 @login_required
@@ -1471,21 +1914,22 @@ def send_message():
 def get_messages():
     """SSE endpoint for real-time chat messages"""
     def generate():
-        last_count = 0
+        with chat_lock:
+            # Start with everything still buffered, like a fresh history load
+            last_count = chat_message_count - len(chat_messages)
         while True:
-            with chat_lock:
-                current_count = len(chat_messages)
-                if current_count > last_count:
-                    # Send only new messages
-                    new_messages = chat_messages[last_count:]
-                    yield f"data: {json.dumps(new_messages)}\n\n"
-                    last_count = current_count
-                elif current_count < last_count:
-                    # Messages were cleared, send all
-                    yield f"data: {json.dumps(chat_messages)}\n\n"
-                    last_count = current_count
+            with chat_updated:
+                # Block until add_chat_message() notifies instead of polling
+                chat_updated.wait_for(lambda: chat_message_count > last_count, timeout=CHAT_KEEPALIVE)
+                new_count = min(chat_message_count - last_count, len(chat_messages))
+                new_messages = chat_messages[-new_count:] if new_count else []
+                last_count = chat_message_count
             
-            time.sleep(0.3)
+            if new_messages:
+                yield SSE_PREFIX + orjson.dumps(new_messages) + SSE_SUFFIX
+            else:
+                # SSE comment - ignored by EventSource, but detects closed connections
+                yield SSE_KEEPALIVE
     
     return Response(generate(), mimetype='text/event-stream')
 
@@ -1528,7 +1972,7 @@ def set_username():
 def chat_page():
     """Standalone chat page"""
     username = get_username()
-    return render_template("chat_app.html", username=username)
+    return render_template(CHAT_APP_TEMPLATE, username=username)
 
 @app.route("/file_status")
 @login_required
@@ -1559,26 +2003,41 @@ log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
 # Register shutdown handlers
+shutdown_lock = threading.RLock()  # Re-entrant: a signal can arrive while atexit is already saving
+shutdown_done = False
+
+def shutdown():
+    """Save all activity to the log file - runs at most once per process"""
+    global shutdown_done
+    with shutdown_lock:
+        if shutdown_done:
+            return
+        shutdown_done = True
+        print("\n\n🛑 Server shutting down...")
+        print("💾 Saving all activity to log file...")
+        save_all_metadata_to_file()
+        # Unfinished folder uploads can't resume after a restart - free their staging space
+        with folder_uploads_lock:
+            for info in folder_uploads.values():
+                shutil.rmtree(info['temp_path'], ignore_errors=True)
+        print("✓ Shutdown complete.\n")
+
 def signal_handler(sig, frame):
     """Handle shutdown signals"""
-    print("\n\n🛑 Server shutting down...")
-    print("💾 Saving all activity to log file...")
-    save_all_metadata_to_file()
-    print("✓ Shutdown complete.\n")
+    shutdown()
+    # exit() runs the atexit handlers, which now skip the already-written log
     exit(0)
 
 def exit_handler():
     """Handle normal exit"""
-    print("\n\n🛑 Server shutting down...")
-    print("💾 Saving all activity to log file...")
-    save_all_metadata_to_file()
-    print("✓ Shutdown complete.\n")
-
-# Register signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+    shutdown()
+
+# Save the log on normal exit - under gunicorn the worker's own signal handlers end up here
 atexit.register(exit_handler)
 
+# Start background cleanup of abandoned uploads
+threading.Thread(target=cleanup_stale_transfers, daemon=True).start()
+
 @app.errorhandler(413)
 def request_entity_too_large(error):
     """Handle file too large error"""
@@ -1628,4 +2087,14 @@ if __name__ == "__main__":
         print(f"   3. Enter name and wait for dashboard approval")
         print(f"")
         
-        app.run(host="0.0.0.0", port=PORT, threaded=True)
\ No newline at end of file
+        if USE_GUNICORN and os.name != 'nt' and importlib.util.find_spec('gunicorn'):
+            # Replace this process with gunicorn (threaded worker, settings in gunicorn.conf.py)
+            print(f"🦄 Starting gunicorn...")
+            os.execv(sys.executable, [sys.executable, '-m', 'gunicorn',
+                                      '-c', os.path.join(app.root_path, 'gunicorn.conf.py'),
+                                      '--pythonpath', app.root_path, 'app:app'])
+        
+        # Built-in server only - gunicorn installs its own shutdown handlers in the worker
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+        app.run(host="0.0.0.0", port=PORT, threaded=True, request_handler=NoDelayRequestHandler)
\ No newline at end of file
@@ -0,0 +1,28 @@
+# Gunicorn settings (Linux/macOS) - picked up automatically by:
+#   pip install gunicorn
+#   gunicorn app:app
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8000)}"
+
+# Threaded worker: each request runs on a real OS thread, so a folder ZIP or a
+# large upload can't stall chat, SSE streams or other transfers.
+# Every open page holds a thread for as long as it is open (chat SSE stream), plus
+# one per running upload's progress stream - once all threads are taken, new
+# requests queue. Raise GUNICORN_THREADS if more pages than this stay open.
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 256))
+
+# Sessions, chat and transfer state live in process memory - keep ONE worker
+workers = 1
+
+# The gthread worker heartbeats from its main thread, so long requests don't trip
+# this - it only restarts a worker that has actually hung
+timeout = 120
+graceful_timeout = 30
+
+# Keep idle connections open between upload chunks instead of reconnecting each time
+keepalive = 30
@@ -0,0 +1,344 @@
+// Upload helpers shared by the dashboard and files pages
+
+// Upload folder to server (server-side ZIP for large folders - no size limit)
+async function uploadFolderToServer(files, folderName) {
+    const progressFill = document.getElementById('progressFill');
+    const speedDisplay = document.getElementById('speedDisplay');
+
+    const totalSize = files.reduce((sum, file) => sum + file.size, 0);
+    const totalSizeMB = (totalSize / (1024 * 1024)).toFixed(2);
+
+    progressFill.style.width = '0%';
+    progressFill.textContent = '0%';
+    speedDisplay.textContent = `Preparing ${files.length} files (${totalSizeMB} MB)...`;
+
+    // Step 1: Start folder upload session
+    const startResponse = await fetch('/upload_folder_start', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            folderName: folderName,
+            totalFiles: files.length,
+            totalSize: totalSize
+        })
+    });
+
+    if (!startResponse.ok) {
+        let error;
+        try { error = await startResponse.json(); } catch (e) { error = { error: `HTTP ${startResponse.status}` }; }
+        throw new Error(error.error || 'Failed to start folder upload');
+    }
+
+    const { folderId } = await startResponse.json();
+
+    // Step 2: Upload files in parallel with chunking for large files
+    const CHUNK_SIZE = 5 * 1024 * 1024; // 5MB chunks
+    const CONCURRENT_UPLOADS = 4; // Number of parallel file uploads
+
+    let uploadedFiles = 0;
+    let uploadedBytes = 0;
+    const startTime = Date.now();
+
+    // Upload a single file (with chunking for large files)
+    async function uploadFile(file) {
+        const relativePath = file.webkitRelativePath;
+        const totalChunks = Math.max(1, Math.ceil(file.size / CHUNK_SIZE));
+
+        if (file.size === 0) {
+            // Handle empty files - send a single empty chunk
+            const formData = new FormData();
+            formData.append('folderId', folderId);
+            formData.append('relativePath', relativePath);
+            formData.append('chunk', new Blob([]), file.name);
+            formData.append('chunkIndex', 0);
+            formData.append('totalChunks', 1);
+
+            let retries = 5;
+            while (retries > 0) {
+                try {
+                    const response = await fetch('/upload_folder_file', {
+                        method: 'POST',
+                        body: formData
+                    });
+                    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                    const result = await response.json();
+                    if (!result.success) throw new Error(result.error || 'Upload failed');
+                    break;
+                } catch (err) {
+                    retries--;
+                    if (retries === 0) throw err;
+                    await new Promise(r => setTimeout(r, 1000));
+                }
+            }
+        } else {
+            for (let chunkIndex = 0; chunkIndex < totalChunks; chunkIndex++) {
+                const start = chunkIndex * CHUNK_SIZE;
+                const end = Math.min(start + CHUNK_SIZE, file.size);
+                const chunk = file.slice(start, end);
+
+                const formData = new FormData();
+                formData.append('folderId', folderId);
+                formData.append('relativePath', relativePath);
+                formData.append('chunk', chunk);
+                formData.append('chunkIndex', chunkIndex);
+                formData.append('totalChunks', totalChunks);
+                formData.append('chunkSize', CHUNK_SIZE);
+                formData.append('fileSize', file.size);
+
+                let retries = 5;
+                while (retries > 0) {
+                    try {
+                        const response = await fetch('/upload_folder_file', {
+                            method: 'POST',
+                            body: formData
+                        });
+
+                        if (!response.ok) {
+                            throw new Error(`HTTP ${response.status}`);
+                        }
+
+                        const result = await response.json();
+                        if (!result.success) {
+                            throw new Error(result.error || 'Upload failed');
+                        }
+
+                        uploadedBytes += chunk.size;
+                        break; // Success
+                    } catch (err) {
+                        retries--;
+                        if (retries === 0) {
+                            console.error(`Failed to upload ${file.name}:`, err);
+                            throw err;
+                        }
+                        await new Promise(r => setTimeout(r, 1500 * (6 - retries))); // Exponential backoff
+                    }
+                }
+            }
+        }
+
+        uploadedFiles++;
+
+        // Update progress
+        const percent = Math.round((uploadedFiles / files.length) * 90); // 90% for upload, 10% for server zip
+        const elapsed = (Date.now() - startTime) / 1000;
+        const speed = elapsed > 0 ? uploadedBytes / elapsed / (1024 * 1024) : 0;
+
+        progressFill.style.width = percent + '%';
+        progressFill.textContent = `${percent}%`;
+        speedDisplay.textContent = `Uploading: ${uploadedFiles}/${files.length} files | ${speed.toFixed(2)} MB/s`;
+    }
+
+    // Process files in batches for parallel upload
+    for (let i = 0; i < files.length; i += CONCURRENT_UPLOADS) {
+        const batch = files.slice(i, i + CONCURRENT_UPLOADS);
+        await Promise.all(batch.map(file => uploadFile(file)));
+    }
+
+    // Step 3: Finalize - server creates ZIP asynchronously
+    progressFill.style.width = '92%';
+    progressFill.textContent = '92%';
+    speedDisplay.textContent = 'Creating ZIP on server...';
+
+    const finalizeResponse = await fetch('/upload_folder_finalize', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ folderId: folderId })
+    });
+
+    if (!finalizeResponse.ok) {
+        let error;
+        try { error = await finalizeResponse.json(); } catch (e) { error = { error: `HTTP ${finalizeResponse.status}` }; }
+        throw new Error(error.error || 'Failed to create ZIP');
+    }
+
+    const finalizeResult = await finalizeResponse.json();
+
+    // If async, poll for completion
+    if (finalizeResult.async) {
+        let result = null;
+        while (true) {
+            await new Promise(r => setTimeout(r, 2000)); // Poll every 2 seconds
+
+            try {
+                const statusResponse = await fetch(`/upload_folder_finalize_status/${folderId}`);
+                const status = await statusResponse.json();
+
+                if (status.status === 'complete') {
+                    result = status;
+                    break;
+                } else if (status.status === 'error') {
+                    throw new Error(status.error || 'ZIP creation failed on server');
+                } else {
+                    // Still processing - update progress
+                    const zipProgress = 90 + Math.round((status.progress || 0) / 100 * 10);
+                    progressFill.style.width = zipProgress + '%';
+                    progressFill.textContent = `${zipProgress}%`;
+                    speedDisplay.textContent = `Creating ZIP on server... ${status.progress || 0}%`;
+                }
+            } catch (pollErr) {
+                if (pollErr.message.includes('ZIP creation failed')) throw pollErr;
+                // Network error during poll - retry
+                console.warn('Poll error, retrying...', pollErr);
+            }
+        }
+
+        progressFill.style.width = '100%';
+        progressFill.textContent = 'Complete! ✓';
+        speedDisplay.textContent = `Uploaded ${result.fileCount} files (${(result.size / (1024 * 1024)).toFixed(2)} MB) at ${result.speed} MB/s`;
+        return result;
+    } else {
+        // Synchronous response (backward compat)
+        progressFill.style.width = '100%';
+        progressFill.textContent = 'Complete! ✓';
+        speedDisplay.textContent = `Uploaded ${finalizeResult.fileCount} files (${(finalizeResult.size / (1024 * 1024)).toFixed(2)} MB) at ${finalizeResult.speed} MB/s`;
+        return finalizeResult;
+    }
+}
+
+// Upload a stream's chunk range, keeping several requests in flight so the next
+// chunk is already queued when one finishes (no idle round-trip between chunks).
+// Each request covers `span` consecutive chunks: fast requests double it (fewer
+// round-trips on a LAN), slow or failed ones halve it (less to resend on weak Wi-Fi).
+function uploadStream(file, stream, chunkSize, onProgress, onComplete) {
+    const { streamId, startChunk, endChunk, transferId } = stream;
+    const MAX_RETRIES = 5;
+    const MAX_IN_FLIGHT = 2;
+    const MAX_SPAN = 8; // chunks per request (8MB with 1MB chunks)
+    const FAST_REQUEST_MS = 300;
+    const SLOW_REQUEST_MS = 2000;
+    const totalChunks = Math.ceil(file.size / chunkSize);
+    let nextChunk = startChunk;
+    let span = 1;
+    let inFlight = 0;
+    let failed = false;
+
+    function sendChunk(chunkIndex, chunkCount, retryCount) {
+        const start = chunkIndex * chunkSize;
+        const end = Math.min(start + chunkCount * chunkSize, file.size);
+        const chunk = file.slice(start, end);
+
+        // Send the bytes as the raw body - the server writes them straight to the file
+        const params = new URLSearchParams({
+            transferId: transferId,
+            chunkIndex: chunkIndex,
+            chunkCount: chunkCount,
+            totalChunks: totalChunks,
+            chunkSize: chunkSize,
+            totalSize: file.size,
+            filename: file.name,
+            streamId: streamId
+        });
+
+        console.log(`Stream ${streamId}: Uploading chunk ${chunkIndex} x${chunkCount} (${chunk.size} bytes)`);
+        const requestStart = Date.now();
+
+        fetch(`/upload_chunk?${params}`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: chunk
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                if (data.success) {
+                    console.log(`Stream ${streamId}: Chunk ${chunkIndex} x${chunkCount} uploaded successfully`);
+                    const elapsed = Date.now() - requestStart;
+                    if (elapsed < FAST_REQUEST_MS && chunkCount === span) {
+                        span = Math.min(span * 2, MAX_SPAN);
+                    } else if (elapsed > SLOW_REQUEST_MS) {
+                        span = Math.max(1, span >> 1);
+                    }
+                    onProgress(chunkCount, chunk.size);
+                    inFlight--;
+                    fillPipeline();
+                } else {
+                    throw new Error(data.error || 'Upload failed');
+                }
+            })
+            .catch(err => {
+                if (failed) return;
+                console.error(`Stream ${streamId} chunk ${chunkIndex} error:`, err);
+                retryCount++;
+                span = Math.max(1, span >> 1);
+
+                if (retryCount < MAX_RETRIES) {
+                    console.log(`Stream ${streamId}: Retrying chunk ${chunkIndex} (attempt ${retryCount}/${MAX_RETRIES})`);
+                    setTimeout(() => sendChunk(chunkIndex, chunkCount, retryCount), 1000 * retryCount); // Exponential backoff
+                } else {
+                    failed = true;
+                    console.error(`Stream ${streamId}: Failed after ${MAX_RETRIES} retries`);
+                    alert(`Upload failed for chunk ${chunkIndex}. Please try again.`);
+                }
+            });
+    }
+
+    function fillPipeline() {
+        if (failed) return;
+        while (inFlight < MAX_IN_FLIGHT && nextChunk < endChunk) {
+            const chunkCount = Math.min(span, endChunk - nextChunk);
+            inFlight++;
+            sendChunk(nextChunk, chunkCount, 0);
+            nextChunk += chunkCount;
+        }
+        if (inFlight === 0 && nextChunk >= endChunk) {
+            console.log(`Stream ${streamId} completed`);
+            onComplete();
+        }
+    }
+
+    fillPipeline();
+}
+
+// Upload a single file as chunks over several parallel streams
+function uploadFileParallel(file, onComplete) {
+    const progressFill = document.getElementById('progressFill');
+    const speedDisplay = document.getElementById('speedDisplay');
+
+    const chunkSize = 1 * 1024 * 1024; // 1MB chunks (better for large files)
+    const numStreams = 4;
+    const totalChunks = Math.ceil(file.size / chunkSize);
+    let completedChunks = 0;
+    let startTime = Date.now();
+    let uploadedBytes = 0;
+
+    const chunksPerStream = Math.ceil(totalChunks / numStreams);
+    const streams = [];
+    // Random ID shared by this file's streams (crypto.randomUUID needs HTTPS, getRandomValues doesn't)
+    const transferId = Array.from(crypto.getRandomValues(new Uint8Array(16)),
+        b => b.toString(16).padStart(2, '0')).join('');
+
+    for (let streamId = 0; streamId < numStreams; streamId++) {
+        const startChunk = streamId * chunksPerStream;
+        const endChunk = Math.min(startChunk + chunksPerStream, totalChunks);
+
+        if (startChunk < totalChunks) {
+            streams.push({ streamId, startChunk, endChunk, transferId });
+        }
+    }
+
+    let activeStreams = streams.length;
+
+    streams.forEach(stream => {
+        uploadStream(file, stream, chunkSize, function (progress, bytes) {
+            completedChunks += progress;
+            uploadedBytes += bytes;
+
+            const percent = (completedChunks / totalChunks) * 100;
+            const elapsed = (Date.now() - startTime) / 1000;
+            const speed = uploadedBytes / elapsed / (1024 * 1024);
+
+            progressFill.style.width = percent + '%';
+            progressFill.textContent = Math.round(percent) + '%';
+            speedDisplay.textContent = `Speed: ${speed.toFixed(2)} MB/s`;
+        }, function () {
+            activeStreams--;
+            if (activeStreams === 0) {
+                onComplete();
+            }
+        });
+    });
+}
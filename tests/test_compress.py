@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+# Keep the app's shared folder out of the working tree
+os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+
+
+def get_static(filename):
+    with app.test_request_context():
+        url = app.url_for('static', filename=filename)
+    return app.test_client().get(url, headers={'Accept-Encoding': 'gzip'})
+
+
+def test_static_is_gzipped():
+    response = get_static('css/dashboard.css')
+    assert response.headers.get('Content-Encoding') == 'gzip'
+    assert response.headers['ETag'].endswith('-gzip"')
+    response.close()
+
+
+def test_static_not_gzipped_under_x_sendfile():
+    app.config['USE_X_SENDFILE'] = True
+    try:
+        response = get_static('css/dashboard.css')
+    finally:
+        app.config['USE_X_SENDFILE'] = False
+    assert 'X-Sendfile' in response.headers
+    assert 'Content-Encoding' not in response.headers
+    assert not response.headers.get('ETag', '').endswith('-gzip"')
+    response.close()